@@ -1,10 +1,19 @@
 """Litestar base api with endpoints."""
+import asyncio
+import multiprocessing
+import os
+import shutil
 import tempfile
-from typing import Annotated
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Annotated, Callable
 
 from litestar import post, Litestar
-from litestar.datastructures import UploadFile
+from litestar.background_tasks import BackgroundTask
+from litestar.datastructures import State, UploadFile
 from litestar.enums import RequestEncodingType
+from litestar.exceptions import ServiceUnavailableException
 from litestar.openapi import OpenAPIConfig
 from litestar.openapi.plugins import SwaggerRenderPlugin
 from litestar.params import Body
@@ -13,62 +22,178 @@ from litestar.response import File
 from enums import ReportGroupingType
 from excel_parser import ExcelParser
 
+UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # copy uploads to disk in 1 MiB chunks
+
+# every parse holds a whole workbook in memory, so cap the pool to keep memory bounded
+MAX_CONCURRENT_PARSES: int = 4
+REPORT_POOL_SIZE: int = min(os.cpu_count() or 1, MAX_CONCURRENT_PARSES)
+# the pool is (re)created from a process that already runs threads, which is unsafe to fork
+REPORT_POOL_CONTEXT: str = "forkserver"
+
+# each request works in its own temp dir, removed once the report is sent
+REPORT_DIR_PREFIX: str = "work_time_report_"
+STALE_REPORT_DIR_AGE: int = 60 * 60  # seconds
+STALE_REPORT_SWEEP_INTERVAL: int = 10 * 60  # seconds
+
+
+def build_financial_report(workbook_path: str, rate: int, exchange_rate: float, output_dir: str) -> str:
+    """Generate a financial report, runs inside the report process pool."""
+    parser = ExcelParser(workbook_path=workbook_path)
+    return parser.generate_financial_report(rate=rate, exchange_rate=exchange_rate, output_dir=output_dir)
+
+
+def build_project_report(workbook_path: str, group_type: ReportGroupingType, output_dir: str) -> str:
+    """Generate a project report, runs inside the report process pool."""
+    parser = ExcelParser(workbook_path=workbook_path)
+    return parser.generate_project_report(group_type=group_type, output_dir=output_dir)
+
+
+def remove_stale_report_dirs(max_age: int = STALE_REPORT_DIR_AGE) -> None:
+    """Remove request temp dirs older than max_age seconds, left behind by interrupted requests."""
+    threshold = time.time() - max_age
+    with os.scandir(tempfile.gettempdir()) as entries:
+        for entry in entries:
+            try:
+                if (
+                    entry.name.startswith(REPORT_DIR_PREFIX)
+                    and entry.is_dir(follow_symlinks=False)
+                    and entry.stat(follow_symlinks=False).st_mtime < threshold
+                ):
+                    shutil.rmtree(entry.path, ignore_errors=True)
+            except OSError:
+                continue
+
+
+async def sweep_stale_report_dirs() -> None:
+    """Periodically remove stale request temp dirs."""
+    while True:
+        await asyncio.sleep(STALE_REPORT_SWEEP_INTERVAL)
+        await asyncio.to_thread(remove_stale_report_dirs)
+
+
+async def save_upload(data: UploadFile, directory: str) -> str:
+    """Save the uploaded workbook into the directory and return its path."""
+    with tempfile.NamedTemporaryFile(dir=directory, delete=False, suffix=".xlsx") as tmp:
+        while chunk := await data.read(UPLOAD_CHUNK_SIZE):
+            tmp.write(chunk)
+        tmp.flush()
+        return tmp.name
+
+
+def report_response(output_path: str, work_dir: str) -> File:
+    """Send the generated report and remove the request temp dir afterwards."""
+    return File(
+        path=output_path,
+        filename=os.path.basename(output_path),
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        background=BackgroundTask(shutil.rmtree, work_dir, ignore_errors=True)
+    )
+
+
+def create_report_pool() -> ProcessPoolExecutor:
+    """Create a process pool for report generation."""
+    return ProcessPoolExecutor(
+        max_workers=REPORT_POOL_SIZE, mp_context=multiprocessing.get_context(REPORT_POOL_CONTEXT)
+    )
+
+
+def start_report_pool(app: Litestar) -> None:
+    """Create the process pool used to generate reports off the event loop."""
+    app.state.report_pool = create_report_pool()
+
+
+def replace_report_pool(state: State, broken_pool: ProcessPoolExecutor) -> None:
+    """Swap a pool broken by a dead worker (e.g. OOM killed) for a fresh one."""
+    # concurrent requests may see the same broken pool, only the first one replaces it
+    if state.report_pool is broken_pool:
+        state.report_pool = create_report_pool()
+    broken_pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def run_in_report_pool(state: State, func: Callable[..., str], *args) -> str:
+    """Run a report builder in the process pool, replacing the pool if a worker died."""
+    for _ in range(2):
+        pool = state.report_pool
+        try:
+            future = pool.submit(func, *args)
+        except BrokenProcessPool:
+            # the job never started, so it is safe to hand it to a fresh pool
+            replace_report_pool(state, pool)
+            continue
+        try:
+            return await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            # the worker died while this job was running (likely an upload that got it OOM killed), don't resubmit
+            replace_report_pool(state, pool)
+            break
+    raise ServiceUnavailableException(detail="Report worker crashed, try again later")
+
+
+def stop_report_pool(app: Litestar) -> None:
+    """Shut down the report process pool."""
+    app.state.report_pool.shutdown()
+
+
+def start_cleanup(app: Litestar) -> None:
+    """Remove leftovers of previous runs and schedule the periodic stale dir sweep."""
+    # reports used to be written into the working dir
+    ExcelParser.cleanup_excel_files()
+    remove_stale_report_dirs()
+    app.state.cleanup_task = asyncio.create_task(sweep_stale_report_dirs())
+
+
+def stop_cleanup(app: Litestar) -> None:
+    """Stop the periodic stale dir sweep."""
+    app.state.cleanup_task.cancel()
+
 
 @post("/generate-personal-time")
 async def generate_personal_time(
     data: Annotated[UploadFile, Body(media_type=RequestEncodingType.MULTI_PART, title="File Upload!")],
     rate: Annotated[int, Body(title="Set your rate")],
-    exchange_rate: Annotated[float, Body(title="Set your exchange rate")]
+    exchange_rate: Annotated[float, Body(title="Set your exchange rate")],
+    state: State
 ) -> File:
     """Update timesheet."""
-    # clear all xlsx files in folder
-    ExcelParser.cleanup_excel_files()
+    work_dir = tempfile.mkdtemp(prefix=REPORT_DIR_PREFIX)
+    try:
+        # Save uploaded file to a temp file
+        temp_path = await save_upload(data, work_dir)
 
-    # Save uploaded file to a temp file
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx") as tmp:
-        contents = await data.read()
-        tmp.write(contents)
-        tmp.flush()
-        temp_path = tmp.name
-
-    # Process file
-    parser = ExcelParser(workbook_path=temp_path)
-    output_path = parser.generate_financial_report(rate=rate, exchange_rate=exchange_rate)
+        # Process file
+        output_path = await run_in_report_pool(
+            state, build_financial_report, temp_path, rate, exchange_rate, work_dir
+        )
+    except BaseException:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        raise
 
-    return File(
-        path=output_path,
-        filename=output_path,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
+    return report_response(output_path, work_dir)
 
 @post("/generate-project-time")
 async def generate_project_time(
     data: Annotated[UploadFile, Body(media_type=RequestEncodingType.MULTI_PART, title="File Upload!")],
-    group_type: ReportGroupingType
+    group_type: ReportGroupingType,
+    state: State
 ) -> File:
     """Generate project time."""
-    # clear all xlsx files in folder
-    ExcelParser.cleanup_excel_files()
+    work_dir = tempfile.mkdtemp(prefix=REPORT_DIR_PREFIX)
+    try:
+        # Save uploaded file to a temp file
+        temp_path = await save_upload(data, work_dir)
 
-    # Save uploaded file to a temp file
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx") as tmp:
-        contents = await data.read()
-        tmp.write(contents)
-        tmp.flush()
-        temp_path = tmp.name
-
-    # Process file
-    parser = ExcelParser(workbook_path=temp_path)
-    output_path = parser.generate_project_report(group_type=group_type)
+        # Process file
+        output_path = await run_in_report_pool(state, build_project_report, temp_path, group_type, work_dir)
+    except BaseException:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        raise
 
-    return File(
-        path=output_path,
-        filename=output_path,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
+    return report_response(output_path, work_dir)
 
 app = Litestar(
     route_handlers=[generate_personal_time, generate_project_time],
+    on_startup=[start_report_pool, start_cleanup],
+    on_shutdown=[stop_cleanup, stop_report_pool],
     openapi_config=OpenAPIConfig(
         title="My API",
         version="1.0.0",
@@ -76,4 +201,4 @@ app = Litestar(
         render_plugins=[SwaggerRenderPlugin()],
     ),
     debug=True
-)
\ No newline at end of file
+)
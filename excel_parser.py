@@ -4,36 +4,49 @@ Excel parser for removing unused columns and generating financial or project-bas
 Supports grouping by full month or split-half (1–15, 16–end).
 """
 import calendar
-import glob
 import os
 import uuid
 from collections import defaultdict
-from datetime import datetime
+from datetime import date, datetime
+from functools import lru_cache
+from itertools import islice
+from operator import itemgetter
 
-from openpyxl import load_workbook
-from openpyxl.styles import Font, PatternFill, DEFAULT_FONT, Alignment
-from openpyxl.styles.numbers import FORMAT_NUMBER_00, FORMAT_NUMBER
+import xlsxwriter
 from openpyxl.utils import column_index_from_string
 from openpyxl.workbook import Workbook
-from openpyxl.worksheet.worksheet import Worksheet
+from python_calamine import CalamineWorkbook
+from xlsxwriter.format import Format
+from xlsxwriter.worksheet import Worksheet
 
 from enums import ReportGroupingType
 
+REPORT_FONT_NAME: str = "Ubuntu"
+TEAMWORK_TASK_URL: str = "https://avada.teamwork.com/#tasks/"
+# Excel allows at most 65,530 hyperlinks per worksheet
+MAX_WORKSHEET_URLS: int = 65530
+
+# cell formats of the generated reports, added once per workbook
+REPORT_FORMATS: dict[str, dict] = {
+    "text": {},
+    "bold": {"bold": True},
+    "bold_number_00": {"bold": True, "num_format": "0.00"},
+    "number": {"num_format": "0"},
+    "number_00": {"num_format": "0.00"},
+    "header": {"bold": True, "bg_color": "#BDBDBD"},
+    "title": {"bold": True, "bg_color": "#CFE2F3"},
+    "period": {"bold": True, "italic": True, "bg_color": "#E0E0E0"},
+    "summary": {"bg_color": "#E8F0FE"},
+    "summary_label": {"bold": True, "bg_color": "#E8F0FE"},
+    "summary_number_00": {"bg_color": "#E8F0FE", "num_format": "0.00"},
+    "summary_unit": {"bg_color": "#E8F0FE", "align": "right"},
+}
+
 
 class ExcelParser:
     """Excel parser class for generating reports."""
 
-    UNUSED_COLUMNS: list = [
-        "A", "C", "D",  # ID, Date/Time, End date/time
-        "F", "H", "I",  # Who, Project Category, Company
-        "J", "L", "M",  # Task list, Parent task, is sub-task
-        "N", "O", "P",  # Is billable?, Invoice number, Hours
-        "Q", "S",       # Minutes, Estimated(hours),
-        "U", "V", "W",  # Estimated(minutes), Tags, Task tags,
-        "X", "Y", "Z",  # First name, Last name, User ID
-    ]
-
-    PROFILE_UNUSED_COLUMNS: list = [
+    PROFILE_UNUSED_COLUMNS: tuple[str, ...] = (
         "A", "C", "D",  # ID, Date/Time, End date/time
         "F", "H", "I",  # Who, Project Category, Company
         "J", "L", "M",  # Task list, Parent task, is sub-task
@@ -41,23 +54,36 @@ class ExcelParser:
         "Q", "S", "T",  # Minutes, Estimated time, Estimated(hours),
         "U", "V", "W",  # Estimated(minutes), Tags, Task tags,
         "X", "Y", "Z",  # First name, Last name, User ID
-    ]
+    )
+
+    # project reports additionally keep Estimated(hours)
+    UNUSED_COLUMNS: tuple[str, ...] = tuple(col for col in PROFILE_UNUSED_COLUMNS if col != "T")
+
+    # zero-based positions of the unused columns, used to project rows while reading
+    UNUSED_COLUMN_INDICES: frozenset = frozenset(column_index_from_string(col) - 1 for col in UNUSED_COLUMNS)
+    PROFILE_UNUSED_COLUMN_INDICES: frozenset = frozenset(
+        column_index_from_string(col) - 1 for col in PROFILE_UNUSED_COLUMNS
+    )
 
     def __init__(self, workbook_path: str) -> None:
         """Initialize ExcelParser with the path to the workbook."""
         self.workbook_path: str = workbook_path
-        DEFAULT_FONT.name = "Ubuntu"
 
     @staticmethod
     def cleanup_excel_files(directory: str = ".", prefix: str = "", suffix: str = ".xlsx") -> None:
         """Delete all .xlsx files in the specified directory (by default, current working dir)."""
-        pattern = os.path.join(directory, f"{prefix}*{suffix}")
-        for file_path in glob.glob(pattern):
-            try:
-                os.remove(file_path)
-                print(f"Deleted: {file_path}")
-            except Exception as e:
-                print(f"Error deleting {file_path}: {e}")
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                name = entry.name
+                if name.startswith(".") or not name.startswith(prefix) or not name.endswith(suffix):
+                    continue
+                if not entry.is_file():
+                    continue
+                try:
+                    os.unlink(entry.path)
+                    print(f"Deleted: {entry.path}")
+                except OSError as e:
+                    print(f"Error deleting {entry.path}: {e}")
 
     @staticmethod
     def generate_report_filename(report_type: str, date: datetime) -> str:
@@ -65,30 +91,52 @@ class ExcelParser:
         mount_name: str = date.strftime("%B").lower()
         return f"{report_type}_{mount_name}_report.xlsx"
 
+    @staticmethod
+    def _create_report_workbook(path: str) -> xlsxwriter.Workbook:
+        """
+        Create an xlsxwriter workbook for a report.
+
+        Rows are flushed to disk as soon as a later row is written (constant_memory), so they must be
+        written top to bottom. Strings are never turned into formulas or urls implicitly.
+        """
+        return xlsxwriter.Workbook(path, {
+            "constant_memory": True,
+            "strings_to_formulas": False,
+            "strings_to_urls": False,
+            "default_format_properties": {"font_name": REPORT_FONT_NAME},
+        })
+
+    @staticmethod
+    def _add_report_formats(workbook: xlsxwriter.Workbook) -> dict[str, Format]:
+        """Add every report cell format to the workbook once."""
+        return {name: workbook.add_format(properties) for name, properties in REPORT_FORMATS.items()}
+
     @staticmethod
     def _set_column_widths(ws: Worksheet, widths: list[int]) -> None:
         """Set column widths for a given worksheet."""
-        for col_index, width in enumerate(widths, start=1):
-            col_letter = ws.cell(row=1, column=col_index).column_letter
-            ws.column_dimensions[col_letter].width = width
+        for col_index, width in enumerate(widths):
+            ws.set_column(col_index, col_index, width)
+
+    @staticmethod
+    def _write_link(
+        ws: Worksheet, row: int, col: int, url: str, formats: dict[str, Format], links_written: int
+    ) -> None:
+        """Write a clickable url, as plain text once the worksheet holds Excel's maximum of urls."""
+        if links_written < MAX_WORKSHEET_URLS:
+            ws.write_url(row, col, url)
+        else:
+            ws.write_string(row, col, url, formats["text"])
 
     @staticmethod
-    def _write_header_row(ws: Worksheet, headers: list[str]) -> None:
+    def _write_header_row(ws: Worksheet, headers: list[str], formats: dict[str, Format]) -> None:
         """Write a bold header row with gray background."""
-        header_font = Font(name=DEFAULT_FONT.name, bold=True)
-        header_fill = PatternFill(fill_type="solid",start_color="BDBDBD", end_color="BDBDBD")
-        for col_index, value in enumerate(headers, start=1):
-            cell = ws.cell(row=1, column=col_index, value=value)
-            cell.font = header_font
-            cell.fill = header_fill
+        for col_index, value in enumerate(headers):
+            ws.write_string(0, col_index, value, formats["header"])
 
     @staticmethod
-    def _merge_title_row(ws: Worksheet, row: int, title: str) -> None:
+    def _merge_title_row(ws: Worksheet, row: int, title: str, formats: dict[str, Format]) -> None:
         """Merge 8 columns for a title row and apply styling."""
-        ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=8)
-        cell = ws.cell(row=row, column=1, value=title)
-        cell.font = Font(name=DEFAULT_FONT.name, bold=True)
-        cell.fill = PatternFill(fill_type="solid", start_color="CFE2F3", end_color="CFE2F3")
+        ws.merge_range(row - 1, 0, row - 1, 7, title, formats["title"])
 
     @staticmethod
     def _parse_date(raw_date) -> datetime | None:
@@ -102,6 +150,46 @@ class ExcelParser:
                 return None
         return None
 
+    @staticmethod
+    def _format_date(date_val: datetime) -> str:
+        """Format a date as DD.MM.YYYY, ignoring the time of day."""
+        return ExcelParser._format_day(date_val.date())
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _format_day(day: date) -> str:
+        """Format a calendar day, cached since a report only spans a few dozen days."""
+        return f"{day.day:02d}.{day.month:02d}.{day.year}"
+
+    @staticmethod
+    def _normalize_value(value):
+        """Convert a calamine cell value to the type openpyxl would return for it."""
+        value_type = type(value)
+        if value_type is float:
+            # xlsx stores every number as float, keep whole numbers (task ids) as int
+            return int(value) if value.is_integer() else value
+        if value_type is date:
+            # calamine returns plain dates for midnight timestamps
+            return datetime(value.year, value.month, value.day)
+        if value == "":
+            return None
+        return value
+
+    @classmethod
+    def _read_rows(cls, path: str, unused_indices: frozenset) -> tuple[tuple, list[tuple]]:
+        """Read the first worksheet as a header and data value tuples without the unused columns."""
+        with CalamineWorkbook.from_path(path) as wb:
+            # keep the empty leading area so column positions match the sheet letters
+            rows: list[list] = wb.get_sheet_by_index(0).to_python(skip_empty_area=False)
+
+        if not rows:
+            return (), []
+
+        project = itemgetter(*(i for i in range(len(rows[0])) if i not in unused_indices))
+        normalize = cls._normalize_value
+        header = tuple(map(normalize, project(rows[0])))
+        return header, [tuple(map(normalize, project(row))) for row in islice(rows, 1, None)]
+
     @staticmethod
     def build_period_titles(date: datetime) -> dict[str, str]:
         month = date.month
@@ -116,6 +204,7 @@ class ExcelParser:
     @staticmethod
     def _write_bottom_totals(
         ws: Worksheet,
+        formats: dict[str, Format],
         row_cursor: int,
         last_data_row: int,
         rate: int,
@@ -124,269 +213,252 @@ class ExcelParser:
         exch_row: int
     ) -> None:
         """Write total hours, total UAH, and total USD summary at the bottom of the worksheet."""
-        # insert rate and exchange at bottom
-        ws.cell(row=rate_row, column=6, value="Рейт").font = Font(name=DEFAULT_FONT.name, bold=True)
-        ws.cell(row=exch_row, column=6, value="Курс").font = Font(name=DEFAULT_FONT.name, bold=True)
-
-        rate_cell = ws.cell(row=rate_row, column=7, value=rate)
-        rate_cell.font = Font(name=DEFAULT_FONT.name, bold=True)
-        rate_cell.number_format = FORMAT_NUMBER_00
-
-        exchange_cell = ws.cell(row=exch_row, column=7, value=exchange_rate)
-        exchange_cell.font = Font(name=DEFAULT_FONT.name, bold=True)
-        exchange_cell.number_format = FORMAT_NUMBER_00
+        # (row, column, write method, value, format); summary rows may interleave with rate/exchange rows
+        cells: list[tuple] = [
+            # insert rate and exchange at bottom
+            (rate_row, 6, ws.write_string, "Рейт", formats["bold"]),
+            (exch_row, 6, ws.write_string, "Курс", formats["bold"]),
+            (rate_row, 7, ws.write_number, rate, formats["bold_number_00"]),
+            (exch_row, 7, ws.write_number, exchange_rate, formats["bold_number_00"]),
+        ]
 
         # totals
-        ws.cell(row=row_cursor, column=2, value="ИТОГО часов").font = Font(name=DEFAULT_FONT.name, bold=True)
-        sum_hours_cell = ws.cell(row=row_cursor, column=4, value=f"=SUM(D2:D{last_data_row})")
-        sum_hours_cell.number_format = FORMAT_NUMBER_00
-        ws.cell(row=row_cursor, column=5, value="часов").alignment = Alignment(horizontal="right")
-
-        ws.cell(row=row_cursor + 1, column=2, value="ИТОГО к оплате").font = Font(name=DEFAULT_FONT.name, bold=True)
-        sum_uah_cell = ws.cell(row=row_cursor + 1, column=4, value=f"=SUM(G2:G{last_data_row})")
-        sum_uah_cell.number_format = FORMAT_NUMBER_00
-        ws.cell(row=row_cursor + 1, column=5, value="UAH").alignment = Alignment(horizontal="right")
-
-        ws.cell(row=row_cursor + 2, column=2, value="ИТОГО в долларах").font = Font(name=DEFAULT_FONT.name, bold=True)
-        sum_usd_cell = ws.cell(
-            row=row_cursor + 2,
-            column=4,
-            value=f"=SUM(G2:G{last_data_row})/{exchange_rate}"
-        )
-        sum_usd_cell.number_format = FORMAT_NUMBER_00
-        ws.cell(row=row_cursor + 2, column=5, value="$").alignment = Alignment(horizontal="right")
-
-        summary_fill = PatternFill(fill_type="solid", start_color="E8F0FE", end_color="E8F0FE")
-        for r in range(row_cursor, row_cursor + 3):
-            for c in range(2, 6):
-                ws.cell(row=r, column=c).fill = summary_fill
-
-    def remove_unused_columns(self, is_project_report: bool = False) -> str:
-        """Remove unused columns."""
-        wb: Workbook = load_workbook(self.workbook_path)
-        ws: Worksheet = wb.active
-
-        unused_columns: list = self.PROFILE_UNUSED_COLUMNS
+        totals = [
+            ("ИТОГО часов", f"=SUM(D2:D{last_data_row})", "часов"),
+            ("ИТОГО к оплате", f"=SUM(G2:G{last_data_row})", "UAH"),
+            ("ИТОГО в долларах", f"=SUM(G2:G{last_data_row})/{exchange_rate}", "$"),
+        ]
+        for r, (label, formula, unit) in enumerate(totals, start=row_cursor):
+            cells += [
+                (r, 2, ws.write_string, label, formats["summary_label"]),
+                (r, 3, ws.write_blank, None, formats["summary"]),
+                (r, 4, ws.write_formula, formula, formats["summary_number_00"]),
+                (r, 5, ws.write_string, unit, formats["summary_unit"]),
+            ]
+
+        # constant_memory mode needs rows written in order
+        for r, c, write, value, cell_format in sorted(cells, key=itemgetter(0)):
+            write(r - 1, c - 1, value, cell_format)
 
+    @staticmethod
+    def _aggregate_tasks(rows: list[tuple]) -> tuple[dict, dict, dict]:
+        """
+        Sum hours per task id, in order of first appearance.
+
+        Returns (hours, names, estimates) keyed by task id: the last seen name and the first seen estimate are kept.
+        """
+        task_hours: dict = {}
+        task_names: dict = {}
+        task_estimates: dict = {}
+        for row in rows:
+            task_id = row[6]
+            hours = row[4]
+            if type(hours) is not float:
+                hours = float(hours or 0.0)
+            task_hours[task_id] = task_hours.get(task_id, 0.0) + hours
+            task_names[task_id] = row[3] or ""
+            if task_id not in task_estimates:
+                estimated = row[5]
+                task_estimates[task_id] = estimated if type(estimated) is float else float(estimated or 0.0)
+        return task_hours, task_names, task_estimates
+
+    def _unused_column_indices(self, is_project_report: bool = False) -> frozenset:
+        """Return zero-based positions of the columns dropped for the given report type."""
         if is_project_report:
-            unused_columns = self.UNUSED_COLUMNS
+            return self.UNUSED_COLUMN_INDICES
+        return self.PROFILE_UNUSED_COLUMN_INDICES
 
-        indices = [column_index_from_string(col) for col in unused_columns]
-        for col_index in sorted(indices, reverse=True):
-            ws.delete_cols(col_index)
+    def remove_unused_columns(self, is_project_report: bool = False) -> str:
+        """Remove unused columns and save the remaining ones into a new temp workbook."""
+        header, data = self._read_rows(self.workbook_path, self._unused_column_indices(is_project_report))
+
+        new_wb: Workbook = Workbook(write_only=True)
+        new_ws = new_wb.create_sheet()
+        new_ws.append(header)
+        for row in data:
+            new_ws.append(row)
 
         temp_path = self.workbook_path.replace(".xlsx", f"{uuid.uuid4()}_temp.xlsx")
-        wb.save(temp_path)
+        new_wb.save(temp_path)
         return temp_path
 
     def _write_financial_row(
         self,
         ws: Worksheet,
+        formats: dict[str, Format],
         row_cursor: int,
         row_data: tuple,
-        rate_cell_ref: str,
-        exchange_cell_ref: str
+        rate_formula: str,
+        exchange_formula: str,
+        links_written: int
     ) -> int:
         """Write a single financial row with formulas and formating."""
         date_val = self._parse_date(row_data[0])
         desc = row_data[2] or ""
-        task_name = row_data[3] or ""
-        hours = float(row_data[4] or 0.0)
+        hours = row_data[4]
+        if type(hours) is not float:
+            # fractional hours are already floats, only whole numbers and blanks need converting
+            hours = float(hours or 0.0)
         task_id = row_data[5]
-        teamwork_link = f"https://avada.teamwork.com/#tasks/{task_id}"
-
-        ws.cell(row=row_cursor, column=1, value=task_id)
-        cell = ws.cell(row=row_cursor, column=2, value=teamwork_link)
-        cell.hyperlink = teamwork_link
-        cell.style = "Hyperlink"
-        ws.cell(row=row_cursor, column=3, value=desc)
-
-        ws.cell(row=row_cursor, column=4, value=hours).number_format = FORMAT_NUMBER_00
-        ws.cell(row=row_cursor, column=5, value=f"={rate_cell_ref}").number_format = FORMAT_NUMBER_00
-        ws.cell(row=row_cursor, column=6, value=f"={exchange_cell_ref}").number_format = FORMAT_NUMBER_00
-
+        teamwork_link = TEAMWORK_TASK_URL + str(task_id)
         amount_formula = f"=D{row_cursor}*E{row_cursor}*F{row_cursor}"
-        ws.cell(row=row_cursor, column=7, value=amount_formula).number_format = FORMAT_NUMBER_00
-        ws.cell(row=row_cursor, column=8, value=date_val.strftime("%d.%m.%Y") if date_val else "")
 
-        return row_cursor + 1
+        r = row_cursor - 1
+        ws.write(r, 0, task_id, formats["text"])
+        self._write_link(ws, r, 1, teamwork_link, formats, links_written)
+        ws.write(r, 2, desc, formats["text"])
+        ws.write_number(r, 3, hours, formats["number_00"])
+        ws.write_formula(r, 4, rate_formula, formats["number_00"])
+        ws.write_formula(r, 5, exchange_formula, formats["number_00"])
+        ws.write_formula(r, 6, amount_formula, formats["number_00"])
+        ws.write_string(r, 7, self._format_date(date_val) if date_val else "", formats["text"])
 
-    def generate_financial_report(self, rate: int, exchange_rate: float) -> str:
-        """Generate a personal financial report grouped by project with total hours and costs."""
-        temp_path: str = self.remove_unused_columns()
+        return row_cursor + 1
 
-        wb: Workbook = load_workbook(temp_path)
-        ws: Worksheet = wb.active
+    def generate_financial_report(self, rate: int, exchange_rate: float, output_dir: str = "") -> str:
+        """
+        Generate a personal financial report grouped by project with total hours and costs.
 
+        The report is saved into output_dir (current working dir by default), the saved path is returned.
+        """
         # get header and rows data
-        header, *data = ws.iter_rows(values_only=True)
-        data.sort(key=lambda row: row[0])
+        _header, data = self._read_rows(self.workbook_path, self._unused_column_indices())
+        data.sort(key=itemgetter(0))
 
         grouped = defaultdict(list)
         for row in data:
             grouped[row[1]].append(row)
 
         # precompute total rows to know where to place rate/exchange
-        total_data_rows: int = sum(len(rows) + 4 for rows in grouped.values())
+        total_data_rows: int = len(data) + 4 * len(grouped)
 
         rate_row = total_data_rows + 2
         exchange_row = rate_row + 1
 
-        rate_cell_ref = f"$G${rate_row}"
-        exchange_cell_ref = f"$G${exchange_row}"
-
-        new_wb: Workbook = Workbook()
-        new_ws: Worksheet = new_wb.active
-        self._set_column_widths(new_ws, [15, 45, 55, 15, 15, 15, 20, 15])
-
-        headers: list = [
-            "Проект", "Ссылка на TeamWork", "Описание", "Кол-во часов",
-            "Рейт/час [$]", "Курс [$]", "Стоимость (ГРН)", "Дата"
-        ]
-
-        self._write_header_row(new_ws, headers)
-
-        row_cursor: int = 2
-
-        for project, rows in grouped.items():
-            self._merge_title_row(new_ws, row_cursor, project)
-            row_cursor += 1
+        # every row references the same rate/exchange cells, so the formulas are built once
+        rate_formula = f"=$G${rate_row}"
+        exchange_formula = f"=$G${exchange_row}"
 
-            for row in rows:
-                row_cursor = self._write_financial_row(new_ws, row_cursor, row, rate_cell_ref, exchange_cell_ref)
+        output_path: str = os.path.join(output_dir, self.generate_report_filename("financial", data[0][0]))
 
-            row_cursor += 3
+        with self._create_report_workbook(output_path) as new_wb:
+            new_ws: Worksheet = new_wb.add_worksheet()
+            formats = self._add_report_formats(new_wb)
+            self._set_column_widths(new_ws, [15, 45, 55, 15, 15, 15, 20, 15])
 
-        last_data_row = row_cursor - 4
-        row_cursor += 1
+            headers: list = [
+                "Проект", "Ссылка на TeamWork", "Описание", "Кол-во часов",
+                "Рейт/час [$]", "Курс [$]", "Стоимость (ГРН)", "Дата"
+            ]
 
-        self._write_bottom_totals(new_ws, row_cursor, last_data_row, rate, exchange_rate, rate_row, exchange_row)
+            self._write_header_row(new_ws, headers, formats)
 
-        filename: str = self.generate_report_filename("financial", data[0][0])
+            row_cursor: int = 2
+            links_written: int = 0
 
-        new_wb.save(filename)
-
-        return filename
-
-    def generate_project_report(self, group_type: ReportGroupingType) -> str:
-        """Generate a project report."""
-        temp_path: str = self.remove_unused_columns(is_project_report=True)
-
-        wb: Workbook = load_workbook(temp_path)
-        ws: Worksheet = wb.active
+            for project, rows in grouped.items():
+                self._merge_title_row(new_ws, row_cursor, project, formats)
+                row_cursor += 1
 
-        header, *data = ws.iter_rows(values_only=True)
-        data.sort(key=lambda row: row[0])
+                for row in rows:
+                    row_cursor = self._write_financial_row(
+                        new_ws, formats, row_cursor, row, rate_formula, exchange_formula, links_written
+                    )
+                    links_written += 1
 
-        grouped = defaultdict(list)
-        for row in data:
-            grouped[row[1]].append(row)
+                row_cursor += 3
 
-        new_wb = Workbook()
-        new_ws = new_wb.active
-        self._set_column_widths(new_ws, [55, 50, 15, 15])
-
-        self._write_header_row(new_ws, [
-            "Task name", "Link to TeamWork", "Estimated time", "Total count time"
-        ])
-
-        row_cursor = 2
-
-        if group_type == ReportGroupingType.SPLIT_HALF:
-            filename = self.generate_report_filename(f"{group_type.value}_project", data[0][0])
-            grouped_by_period = {
-                "01–15": defaultdict(list),
-                "16–31": defaultdict(list),
-            }
-            for row in data:
-                date_val = self._parse_date(row[0])
-                if not date_val:
-                    continue
-                key = "01–15" if date_val.day <= 15 else "16–31"
-                project = row[1]
-                grouped_by_period[key][project].append(row)
-
-            period_titles = self.build_period_titles(date=data[0][0])
-
-            for period_key in ["01–15", "16–31"]:
-                # Period block title
-                new_ws.merge_cells(start_row=row_cursor, start_column=1, end_row=row_cursor, end_column=4)
-                period_cell = new_ws.cell(row=row_cursor, column=1, value=period_titles[period_key])
-                period_cell.font = Font(name=DEFAULT_FONT.name, bold=True, italic=True)
-                period_cell.fill = PatternFill(fill_type="solid", start_color="E0E0E0", end_color="E0E0E0")
-                row_cursor += 1
+            last_data_row = row_cursor - 4
+            row_cursor += 1
 
-                for project, rows in grouped_by_period[period_key].items():
-                    new_ws.merge_cells(start_row=row_cursor, start_column=1, end_row=row_cursor, end_column=4)
-                    cell = new_ws.cell(row=row_cursor, column=1, value=project)
-                    cell.font = Font(name=DEFAULT_FONT.name, bold=True)
-                    cell.fill = PatternFill(fill_type="solid", start_color="CFE2F3", end_color="CFE2F3")
+            self._write_bottom_totals(
+                new_ws, formats, row_cursor, last_data_row, rate, exchange_rate, rate_row, exchange_row
+            )
+
+        return output_path
+
+    def generate_project_report(self, group_type: ReportGroupingType, output_dir: str = "") -> str:
+        """Generate a project report into output_dir (current working dir by default) and return its path."""
+        _header, data = self._read_rows(self.workbook_path, self._unused_column_indices(is_project_report=True))
+        data.sort(key=itemgetter(0))
+
+        filename = self.generate_report_filename(f"{group_type.value}_project", data[0][0])
+        output_path = os.path.join(output_dir, filename)
+
+        with self._create_report_workbook(output_path) as new_wb:
+            new_ws: Worksheet = new_wb.add_worksheet()
+            formats = self._add_report_formats(new_wb)
+            self._set_column_widths(new_ws, [55, 50, 15, 15])
+
+            self._write_header_row(new_ws, [
+                "Task name", "Link to TeamWork", "Estimated time", "Total count time"
+            ], formats)
+
+            row_cursor = 2
+            links_written = 0
+
+            if group_type == ReportGroupingType.SPLIT_HALF:
+                first_half = defaultdict(list)
+                second_half = defaultdict(list)
+                grouped_by_period = {
+                    "01–15": first_half,
+                    "16–31": second_half,
+                }
+                parse_date = self._parse_date
+                for row in data:
+                    date_val = parse_date(row[0])
+                    if not date_val:
+                        continue
+                    (first_half if date_val.day <= 15 else second_half)[row[1]].append(row)
+
+                period_titles = self.build_period_titles(date=data[0][0])
+
+                for period_key in ["01–15", "16–31"]:
+                    # Period block title
+                    new_ws.merge_range(
+                        row_cursor - 1, 0, row_cursor - 1, 3, period_titles[period_key], formats["period"]
+                    )
                     row_cursor += 1
 
-                    task_map = defaultdict(lambda: {"task_name": "", "hours": 0.0, "estimated": None})
-                    for row in rows:
-                        task_id = row[6]
-                        task_name = row[3] or ""
-                        hrs = float(row[4] or 0.0)
-                        estimated = float(row[5] or 0.0)
-
-                        task_map[task_id]["task_name"] = task_name
-                        task_map[task_id]["hours"] += hrs
-                        if task_map[task_id]["estimated"] is None and estimated is not None:
-                            task_map[task_id]["estimated"] = estimated
-
-                    for task_id, task in task_map.items():
-                        new_ws.cell(row=row_cursor, column=1, value=task["task_name"])
-                        url = f"https://avada.teamwork.com/#tasks/{task_id}"
-                        cell = new_ws.cell(row=row_cursor, column=2, value=url)
-                        cell.hyperlink = url
-                        cell.style = "Hyperlink"
-                        new_ws.cell(
-                            row=row_cursor, column=3, value=task["estimated"] if task["estimated"] else None
-                        ).number_format = FORMAT_NUMBER
-                        new_ws.cell(row=row_cursor, column=4, value=task["hours"]).number_format = FORMAT_NUMBER_00
+                    for project, rows in grouped_by_period[period_key].items():
+                        new_ws.merge_range(row_cursor - 1, 0, row_cursor - 1, 3, project, formats["title"])
                         row_cursor += 1
 
-                    row_cursor += 2  # space between projects
-
-                row_cursor += 2  # space between periods
-        else:
-            projects = defaultdict(list)
-            for row in data:
-                projects[row[1]].append(row)
-
-            filename = self.generate_report_filename(f"{group_type.value}_project", data[0][0])
-            for project, rows in grouped.items():
-                new_ws.merge_cells(start_row=row_cursor, start_column=1, end_row=row_cursor, end_column=4)
-                cell = new_ws.cell(row=row_cursor, column=1, value=project)
-                cell.font = Font(bold=True)
-                cell.fill = PatternFill(fill_type="solid", start_color="CFE2F3", end_color="CFE2F3")
-                row_cursor += 1
-
-                tasks = defaultdict(lambda: {"task_name": "", "hours": 0.0, "estimated": None})
-                for row in rows:
-                    task_id = row[6]
-                    name = row[3] or ""
-                    hrs = float(row[4] or 0.0)
-                    estimated = float(row[5] or 0.0)
-
-                    tasks[task_id]["task_name"] = name
-                    tasks[task_id]["hours"] += hrs
-                    if tasks[task_id]["estimated"] is None and estimated is not None:
-                        tasks[task_id]["estimated"] = estimated
-
-                for task_id, task in tasks.items():
-                    new_ws.cell(row=row_cursor, column=1, value=task["task_name"])
-                    url = f"https://avada.teamwork.com/#tasks/{task_id}"
-                    cell = new_ws.cell(row=row_cursor, column=2, value=url)
-                    cell.hyperlink = url
-                    cell.style = "Hyperlink"
-                    new_ws.cell(
-                        row=row_cursor, column=3, value=task["estimated"] if task["estimated"] else None
-                    ).number_format = FORMAT_NUMBER
-                    new_ws.cell(row=row_cursor, column=4, value=task["hours"]).number_format = FORMAT_NUMBER_00
+                        task_hours, task_names, task_estimates = self._aggregate_tasks(rows)
+                        for task_id, hours in task_hours.items():
+                            r = row_cursor - 1
+                            url = TEAMWORK_TASK_URL + str(task_id)
+                            estimated = task_estimates[task_id]
+                            new_ws.write(r, 0, task_names[task_id], formats["text"])
+                            self._write_link(new_ws, r, 1, url, formats, links_written)
+                            links_written += 1
+                            new_ws.write(r, 2, estimated if estimated else None, formats["number"])
+                            new_ws.write_number(r, 3, hours, formats["number_00"])
+                            row_cursor += 1
+
+                        row_cursor += 2  # space between projects
+
+                    row_cursor += 2  # space between periods
+            else:
+                projects = defaultdict(list)
+                for row in data:
+                    projects[row[1]].append(row)
+
+                for project, rows in projects.items():
+                    new_ws.merge_range(row_cursor - 1, 0, row_cursor - 1, 3, project, formats["title"])
                     row_cursor += 1
-                row_cursor += 2
 
-        new_wb.save(filename)
-        return filename
+                    task_hours, task_names, task_estimates = self._aggregate_tasks(rows)
+                    for task_id, hours in task_hours.items():
+                        r = row_cursor - 1
+                        url = TEAMWORK_TASK_URL + str(task_id)
+                        estimated = task_estimates[task_id]
+                        new_ws.write(r, 0, task_names[task_id], formats["text"])
+                        self._write_link(new_ws, r, 1, url, formats, links_written)
+                        links_written += 1
+                        new_ws.write(r, 2, estimated if estimated else None, formats["number"])
+                        new_ws.write_number(r, 3, hours, formats["number_00"])
+                        row_cursor += 1
+                    row_cursor += 2
+
+        return output_path